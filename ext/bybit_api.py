@@ -1,75 +1,139 @@
 # ext/bybit_api.py
 import asyncio
+import os
 from typing import List, Optional
 import aiohttp
 from aiohttp import ClientResponseError, ContentTypeError
 import logging
 
+from ext.utils import RateLimiter, json_loads
+
 API_BASE_URL = "https://api.bybit.com/v5/market/"
+INSTRUMENTS_URL = f"{API_BASE_URL}instruments-info"
+KLINE_URL = f"{API_BASE_URL}kline"
+
+# (contractType, settleCoin, status) подходящих инструментов
+_USDT_PERPETUAL_KEYS = frozenset({('LinearPerpetual', 'USDT', 'Trading')})
+
+# Признаки перегрузки со стороны Bybit
+_OVERLOAD_STATUSES = frozenset({403, 429})
+_RATE_LIMIT_RET_CODE = 10006
 
 logger = logging.getLogger(__name__)
 
+
+class AdaptiveLimiter:
+    """
+    Адаптивный ограничитель числа одновременных запросов (AIMD).
+
+    После успешного ответа лимит плавно растёт (на 1/limit, т.е. примерно на единицу
+    за "поколение" запросов) до max_limit; при признаках перегрузки — уменьшается вдвое.
+
+    Вход в контекст возвращает номер поколения — число снижений лимита на момент
+    старта запроса. Снижение применяется не чаще раза за поколение: ответы запросов,
+    начатых до последнего снижения, относятся к той же волне перегрузки и игнорируются.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit: float = float(max_limit)
+        self._in_flight = 0
+        self._generation = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> int:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+            return self._generation
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def on_overload(self, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._generation += 1
+        self.limit = max(float(self.min_limit), self.limit / 2)
+        logger.warning("Bybit сигнализирует о перегрузке, лимит параллельных запросов снижен до %d.", int(self.limit))
+
+
+_kline_limiter = AdaptiveLimiter(int(os.getenv("BYBIT_MAX_CONCURRENCY", 50)))
+# Лимит Bybit для market-эндпоинтов — 600 запросов за 5 секунд с одного IP
+_kline_rate_limiter = RateLimiter(int(os.getenv("BYBIT_REQUESTS_PER_SECOND", 120)), 1.0)
+
 async def get_usdt_perpetual_symbols(session: aiohttp.ClientSession) -> List[str]:
     """
     Получает список символов USDT Perpetual из API Bybit.
     """
-    url = f"{API_BASE_URL}instruments-info"
     params = {
         "category": "linear"
     }
     try:
-        async with session.get(url, params=params) as response:
-            if response.status != 200:
-                logger.error(f"Неправильный статус ответа: {response.status}")
-                return []
-            data = await response.json()
+        async with session.get(INSTRUMENTS_URL, params=params) as response:
+            data = json_loads(await response.read())
             if data.get('retCode') == 0:
                 symbols = [
                     symbol['symbol'] for symbol in data.get('result', {}).get('list', [])
-                    if symbol.get('contractType') == 'LinearPerpetual' and
-                       symbol.get('settleCoin') == 'USDT' and
-                       symbol.get('status') == 'Trading'
+                    if (symbol.get('contractType'), symbol.get('settleCoin'), symbol.get('status'))
+                       in _USDT_PERPETUAL_KEYS
                 ]
-                logger.info(f"Получено {len(symbols)} символов USDT Perpetual.")
+                logger.info("Получено %s символов USDT Perpetual.", len(symbols))
                 return symbols
             else:
-                logger.error(f"Ошибка при получении списка символов: {data.get('retMsg')}")
+                logger.error("Ошибка при получении списка символов: %s", data.get('retMsg'))
                 return []
+    except ClientResponseError as e:
+        logger.error("Неправильный статус ответа: %s", e.status)
+        return []
     except Exception as e:
-        logger.exception(f"Произошла ошибка при получении списка символов: {e}")
+        logger.exception("Произошла ошибка при получении списка символов: %s", e)
         return []
 
 async def get_historical_kline_data(session: aiohttp.ClientSession, symbol: str, interval: str, limit: int) -> List[dict]:
     """
     Получает исторические данные свечей (kline) для заданного символа и интервала.
     """
-    url = f"{API_BASE_URL}kline"
     params = {
         "category": "linear",
         "symbol": symbol,
         "interval": interval,
         "limit": limit
     }
+    generation = None
     try:
-        async with session.get(url, params=params) as response:
-            if response.status != 200:
-                logger.error(f"Неправильный статус ответа для {symbol} на интервале {interval}: {response.status}")
-                return []
-            data = await response.json()
-            logger.debug(f"Полученные данные свечей: {data}")
+        await _kline_rate_limiter.acquire()
+        async with _kline_limiter as generation, session.get(KLINE_URL, params=params) as response:
+            data = json_loads(await response.read())
+            logger.debug("Полученные данные свечей: %s", data)
+            if data.get('retCode') == _RATE_LIMIT_RET_CODE:
+                _kline_limiter.on_overload(generation)
+            else:
+                _kline_limiter.on_success()
             if data.get('retCode') == 0 and data.get('result', {}).get('list'):
                 candle_list = data['result']['list']
-                candle_list = candle_list[::-1]
-                logger.info(f"Получено {len(candle_list)} свечей для {symbol} на интервале {interval}.")
+                candle_list.reverse()
+                logger.info("Получено %s свечей для %s на интервале %s.", len(candle_list), symbol, interval)
                 return candle_list
             else:
                 if data.get('retCode') == 0:
-                    logger.warning(f"Нет данных свечей для {symbol} на интервале {interval}.")
+                    logger.warning("Нет данных свечей для %s на интервале %s.", symbol, interval)
                 else:
-                    logger.error(f"Ошибка при получении данных свечей для {symbol}: {data.get('retMsg')}")
+                    logger.error("Ошибка при получении данных свечей для %s: %s", symbol, data.get('retMsg'))
                 return []
+    except ClientResponseError as e:
+        if e.status in _OVERLOAD_STATUSES and generation is not None:
+            _kline_limiter.on_overload(generation)
+        # Обрабатывается и повторяется в get_kline_with_retries
+        raise
     except Exception as e:
-        logger.exception(f"Произошла ошибка при получении данных свечей для {symbol}: {e}")
+        logger.exception("Произошла ошибка при получении данных свечей для %s: %s", symbol, e)
         return []
 
 async def get_kline_with_retries(session: aiohttp.ClientSession, symbol: str, interval: str, limit: int, retries: int = 3, delay: int = 1) -> Optional[List[dict]]:
@@ -82,17 +146,17 @@ async def get_kline_with_retries(session: aiohttp.ClientSession, symbol: str, in
             if kline_data:
                 return kline_data
             else:
-                logger.warning(f"Попытка {attempt} для {symbol} на интервале {interval} вернула пустые данные.")
+                logger.warning("Попытка %s для %s на интервале %s вернула пустые данные.", attempt, symbol, interval)
         except ClientResponseError as e:
-            logger.error(f"Ошибка ответа клиента для {symbol} на интервале {interval}: {e.status}, {e.message}")
+            logger.error("Ошибка ответа клиента для %s на интервале %s: %s, %s", symbol, interval, e.status, e.message)
         except ContentTypeError as e:
-            logger.error(f"Неверный тип содержимого для {symbol} на интервале {interval}: {e}")
+            logger.error("Неверный тип содержимого для %s на интервале %s: %s", symbol, interval, e)
         except Exception as e:
-            logger.exception(f"Неизвестная ошибка для {symbol} на интервале {interval}: {e}")
+            logger.exception("Неизвестная ошибка для %s на интервале %s: %s", symbol, interval, e)
         
         if attempt < retries:
-            logger.info(f"Повторная попытка через {delay} секунд...")
+            logger.info("Повторная попытка через %s секунд...", delay)
             await asyncio.sleep(delay)
     
-    logger.error(f"Не удалось получить данные для {symbol} на интервале {interval} после {retries} попыток.")
+    logger.error("Не удалось получить данные для %s на интервале %s после %s попыток.", symbol, interval, retries)
     return None
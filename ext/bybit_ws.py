@@ -0,0 +1,126 @@
+# ext/bybit_ws.py
+import asyncio
+import contextlib
+import logging
+from operator import itemgetter
+from typing import Any, Dict, List, Sequence
+
+import aiohttp
+
+from ext.candles import Candle
+from ext.utils import json_loads
+
+WS_PUBLIC_LINEAR_URL = "wss://stream.bybit.com/v5/public/linear"
+
+# Bybit принимает не больше 10 топиков в одном запросе subscribe
+_SUBSCRIBE_CHUNK = 10
+# Bybit рекомендует отправлять {"op": "ping"} каждые 20 секунд
+_PING_INTERVAL = 20
+_RECONNECT_DELAY_MAX = 60
+
+logger = logging.getLogger(__name__)
+
+_KLINE_FIELDS = itemgetter('start', 'open', 'high', 'low', 'close', 'volume')
+
+def _parse_kline(item: Dict[str, Any]) -> Candle:
+    """
+    Преобразует элемент data из сообщения kline-топика в Candle.
+
+    Поля достаются одним вызовом itemgetter вместо шести обращений по ключу.
+    """
+    start, open_, high, low, close, volume = _KLINE_FIELDS(item)
+    return Candle(int(start), float(open_), float(high), float(low), float(close), float(volume))
+
+async def _ping(ws: aiohttp.ClientWebSocketResponse) -> None:
+    """
+    Периодически отправляет пинг, чтобы Bybit не закрыл соединение.
+    """
+    while True:
+        await asyncio.sleep(_PING_INTERVAL)
+        await ws.send_json({"op": "ping"})
+
+async def _read_klines(ws: aiohttp.ClientWebSocketResponse, queue: asyncio.Queue) -> None:
+    """
+    Читает сообщения до закрытия соединения и кладёт закрытые свечи в очередь.
+    """
+    async for msg in ws:
+        if msg.type != aiohttp.WSMsgType.TEXT:
+            if msg.type == aiohttp.WSMsgType.ERROR:
+                logger.error("Ошибка WebSocket: %s", ws.exception())
+                break
+            continue
+
+        # Битое сообщение пропускается, а не обрывает поток
+        try:
+            data = json_loads(msg.data)
+            topic = data.get('topic')
+            if topic is None:
+                if data.get('op') == 'subscribe' and not data.get('success'):
+                    logger.error("Bybit отклонил подписку: %s", data.get('ret_msg'))
+                continue
+
+            # topic: kline.{interval}.{symbol}
+            _, interval, symbol = topic.split('.', 2)
+            items = tuple(data.get('data', ()))
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error("Ошибка разбора сообщения WebSocket: %s (%.200s)", e, msg.data)
+            continue
+
+        for item in items:
+            try:
+                if not item.get('confirm'):
+                    continue
+                candle = _parse_kline(item)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                logger.error("Ошибка конвертации свечи %s: %s", topic, e)
+                continue
+            queue.put_nowait((symbol, interval, candle))
+
+async def stream_klines(
+    symbols: Sequence[str],
+    intervals: Sequence[str],
+    queue: asyncio.Queue
+) -> None:
+    """
+    Подписывается на kline-топики Bybit для всех пар (символ, интервал) по одному
+    WebSocket-соединению и кладёт в queue кортежи (symbol, interval, Candle)
+    для каждой закрывшейся свечи (confirm=true).
+
+    Работает до отмены; при обрыве соединения переподключается с
+    экспоненциальной задержкой и подписывается заново. Свечи, закрывшиеся
+    во время переподключения, не приходят — пропуски должен обнаружить потребитель.
+
+    Использует собственную сессию: общий total-таймаут REST-сессии оборвал бы
+    долгоживущее соединение.
+    """
+    topics: List[str] = [f"kline.{interval}.{symbol}" for symbol in symbols for interval in intervals]
+    delay = 1
+
+    timeout = aiohttp.ClientTimeout(total=None, connect=10)
+
+    while True:
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session, \
+                    session.ws_connect(WS_PUBLIC_LINEAR_URL) as ws:
+                for i in range(0, len(topics), _SUBSCRIBE_CHUNK):
+                    await ws.send_json({"op": "subscribe", "args": topics[i:i + _SUBSCRIBE_CHUNK]})
+                logger.info("Подписка на %s kline-топиков Bybit отправлена.", len(topics))
+                delay = 1
+
+                ping_task = asyncio.create_task(_ping(ws))
+                try:
+                    await _read_klines(ws, queue)
+                finally:
+                    ping_task.cancel()
+                    # Забираем результат задачи, чтобы её исключение не потерялось
+                    with contextlib.suppress(asyncio.CancelledError):
+                        try:
+                            await ping_task
+                        except Exception as e:
+                            logger.warning("Пинг WebSocket Bybit завершился с ошибкой: %s", e)
+            logger.warning("WebSocket Bybit закрыт, переподключение через %s секунд...", delay)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Ошибка WebSocket Bybit: %s, переподключение через %s секунд...", e, delay)
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _RECONNECT_DELAY_MAX)
@@ -0,0 +1,143 @@
+# ext/candles.py
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Sequence, Union, overload
+
+
+class Candle(NamedTuple):
+    """
+    Одна свеча; возвращается при обращении к Candles по индексу.
+    """
+    start: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class Candles:
+    """
+    Свечи в колоночном виде (SoA): каждое поле хранится отдельным списком,
+    свечи упорядочены от старых к новым.
+
+    Срез (candles[-5:]) возвращает новый Candles со срезами всех столбцов,
+    индекс (candles[-1]) — отдельную свечу Candle, len() — количество свечей.
+    """
+
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(
+        self,
+        start: List[int],
+        open: List[float],
+        high: List[float],
+        low: List[float],
+        close: List[float],
+        volume: List[float]
+    ):
+        self.start = start
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    @overload
+    def __getitem__(self, index: int) -> Candle: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> 'Candles': ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Candle, 'Candles']:
+        if not isinstance(index, slice):
+            return Candle(
+                self.start[index],
+                self.open[index],
+                self.high[index],
+                self.low[index],
+                self.close[index],
+                self.volume[index]
+            )
+        return Candles(
+            self.start[index],
+            self.open[index],
+            self.high[index],
+            self.low[index],
+            self.close[index],
+            self.volume[index]
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Candles(start={self.start}, open={self.open}, high={self.high}, "
+            f"low={self.low}, close={self.close}, volume={self.volume})"
+        )
+
+
+class CandleBuffer:
+    """
+    Кольцевой буфер последних capacity свечей в колоночном виде.
+
+    Для потоковых данных: закрытая свеча добавляется за O(1) в каждый столбец,
+    а окно для индикаторов собирается копированием столбцов (to_candles)
+    без транспонирования строк.
+    """
+
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity: int, candles: Optional[Candles] = None):
+        self.start: Deque[int] = deque(candles.start if candles else (), maxlen=capacity)
+        self.open: Deque[float] = deque(candles.open if candles else (), maxlen=capacity)
+        self.high: Deque[float] = deque(candles.high if candles else (), maxlen=capacity)
+        self.low: Deque[float] = deque(candles.low if candles else (), maxlen=capacity)
+        self.close: Deque[float] = deque(candles.close if candles else (), maxlen=capacity)
+        self.volume: Deque[float] = deque(candles.volume if candles else (), maxlen=capacity)
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def append(self, candle: Candle) -> None:
+        self.start.append(candle.start)
+        self.open.append(candle.open)
+        self.high.append(candle.high)
+        self.low.append(candle.low)
+        self.close.append(candle.close)
+        self.volume.append(candle.volume)
+
+    def to_candles(self) -> Candles:
+        return Candles(
+            list(self.start),
+            list(self.open),
+            list(self.high),
+            list(self.low),
+            list(self.close),
+            list(self.volume)
+        )
+
+
+def parse_klines(rows: Sequence[Sequence[Union[str, float]]]) -> Candles:
+    """
+    Преобразует строки kline из API Bybit ([start, open, high, low, close, volume, ...])
+    в колоночный Candles.
+
+    Транспонирование и преобразование в числа выполняются через zip/map:
+    int()/float() от строки вызываются из C без промежуточного словаря
+    на каждую свечу, лишние столбцы (turnover) только пропускаются.
+
+    :raises ValueError: Если значение не приводится к числу
+        (или в строке меньше шести полей).
+    """
+    if not rows:
+        return Candles([], [], [], [], [], [])
+    start, open_, high, low, close, volume, *_ = zip(*rows)
+    return Candles(
+        list(map(int, start)),
+        list(map(float, open_)),
+        list(map(float, high)),
+        list(map(float, low)),
+        list(map(float, close)),
+        list(map(float, volume))
+    )
@@ -1,13 +1,31 @@
 # ext/logging_config.py
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+_listener: Optional[QueueListener] = None
 
 def setup_logger(
     log_file: str = 'app.log',
     level: int = logging.INFO
-) -> logging.Logger:
+) -> QueueListener:
     """
-    Настраивает и возвращает корневой логгер для проекта.
+    Настраивает корневой логгер для проекта.
+
+    Записи попадают в очередь через QueueHandler, а в файл их пишет
+    QueueListener в фоновом потоке, поэтому запись логов не блокирует
+    цикл событий. Возвращает запущенный listener; его нужно остановить
+    (listener.stop()) при завершении, чтобы дописать оставшиеся записи.
+
+    Повторный вызов не переустанавливает обработчики и возвращает уже
+    запущенный listener.
     """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
     logger = logging.getLogger()
     logger.setLevel(level)
     
@@ -18,6 +36,11 @@ def setup_logger(
     
     file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
     
-    return logger
+    return _listener
@@ -2,19 +2,23 @@
 
 import os
 import asyncio
-import time
-from collections import deque
+import random
 import logging
 
 from telegram import Bot
 from telegram.error import RetryAfter, TimedOut, TelegramError
 
-from ext.utils import escape_markdown
+from ext.utils import RateLimiter, escape_markdown
 
 MESSAGES_PER_MINUTE = int(os.getenv("MESSAGE_RATE_LIMIT", 20))
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", 50))
+# Сколько секунд после первого сообщения пачки ждать следующих
+MESSAGE_BATCH_LINGER = float(os.getenv("MESSAGE_BATCH_LINGER", 0.5))
+# Запас до лимита Telegram в 4096 символов с учётом экранирования MarkdownV2
+MESSAGE_BATCH_CHARS = 3500
 _WINDOW_SECONDS = 60 
 
-_sent_timestamps: deque[float] = deque()
+_rate_limiter = RateLimiter(MESSAGES_PER_MINUTE, _WINDOW_SECONDS)
 
 async def send_telegram_message(
     bot: Bot,
@@ -23,11 +27,15 @@ async def send_telegram_message(
     logger: logging.Logger,
     max_attempts: int = 5,
     initial_delay: float = 1.0,
-    backoff_factor: float = 2.0
+    backoff_factor: float = 2.0,
+    max_delay: float = 30.0
 ) -> None:
     """
     Отправляет одно текстовое сообщение с экранированием MarkdownV2 и
     экспоненциальным бэкоффом при ошибках.
+
+    Задержка между попытками ограничена max_delay и размывается случайным
+    множителем 0.5–1.5, чтобы воркеры не повторяли запросы синхронно.
     """
     text = escape_markdown(message)
     attempt = 1
@@ -41,27 +49,30 @@ async def send_telegram_message(
                 parse_mode="MarkdownV2",
                 disable_web_page_preview=True
             )
-            logger.info(f"Сообщение отправлено: {message.strip()}")
+            logger.info("Сообщение отправлено: %s", message.strip())
             return
         except RetryAfter as e:
-            logger.warning(f"Flood control: ждём {e.retry_after}s (попытка {attempt}/{max_attempts})")
+            logger.warning("Flood control: ждём %ss (попытка %s/%s)", e.retry_after, attempt, max_attempts)
             await asyncio.sleep(e.retry_after)
         except TimedOut:
-            logger.warning(f"Таймаут отправки (попытка {attempt}/{max_attempts}), ждём {delay:.1f}s")
-            await asyncio.sleep(delay)
-            delay *= backoff_factor
+            wait = delay * (0.5 + random.random())
+            logger.warning("Таймаут отправки (попытка %s/%s), ждём %.1fs", attempt, max_attempts, wait)
+            await asyncio.sleep(wait)
+            delay = min(delay * backoff_factor, max_delay)
         except TelegramError as e:
-            logger.error(f"Ошибка Telegram API: {e} (попытка {attempt}/{max_attempts})")
-            await asyncio.sleep(delay)
-            delay *= backoff_factor
+            wait = delay * (0.5 + random.random())
+            logger.error("Ошибка Telegram API: %s (попытка %s/%s)", e, attempt, max_attempts)
+            await asyncio.sleep(wait)
+            delay = min(delay * backoff_factor, max_delay)
         except Exception as e:
-            logger.error(f"Неизвестная ошибка: {e} (попытка {attempt}/{max_attempts})")
-            await asyncio.sleep(delay)
-            delay *= backoff_factor
+            wait = delay * (0.5 + random.random())
+            logger.error("Неизвестная ошибка: %s (попытка %s/%s)", e, attempt, max_attempts)
+            await asyncio.sleep(wait)
+            delay = min(delay * backoff_factor, max_delay)
 
         attempt += 1
 
-    logger.error(f"Не удалось отправить сообщение после {max_attempts} попыток: {message.strip()}")
+    logger.error("Не удалось отправить сообщение после %s попыток: %s", max_attempts, message.strip())
 
 
 async def message_worker(
@@ -73,34 +84,59 @@ async def message_worker(
     """
     Воркер, обрабатывающий очередь: извлекает сообщения и отправляет их
     с учётом RATE LIMIT.
+
+    Сообщения, поступившие в течение MESSAGE_BATCH_LINGER секунд после первого
+    (до MESSAGE_BATCH_SIZE штук и MESSAGE_BATCH_CHARS символов), склеиваются
+    и уходят одним запросом, лимит считается по запросам к Telegram.
     """
+    loop = asyncio.get_running_loop()
+    carry = None
     while True:
-        message = await message_queue.get()
+        if carry is not None:
+            message, carry = carry, None
+        else:
+            message = await message_queue.get()
         if message == "EXIT":
             logger.info("Воркер получил сигнал завершения.")
             message_queue.task_done()
             break
 
-        # --- RATE LIMITING ---
-        now = time.time()
-        while _sent_timestamps and now - _sent_timestamps[0] >= _WINDOW_SECONDS:
-            _sent_timestamps.popleft()
-
-        if len(_sent_timestamps) >= MESSAGES_PER_MINUTE:
-            wait = _WINDOW_SECONDS - (now - _sent_timestamps[0])
-            logger.info(f"Достигнут лимит {MESSAGES_PER_MINUTE}/минуту. Жду {wait:.1f}s.")
-            await asyncio.sleep(wait)
-            now = time.time()
-            while _sent_timestamps and now - _sent_timestamps[0] >= _WINDOW_SECONDS:
-                _sent_timestamps.popleft()
+        batch = [message]
+        batch_chars = len(message)
+        exit_requested = False
+        deadline = loop.time() + MESSAGE_BATCH_LINGER
+        while len(batch) < MESSAGE_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            try:
+                if timeout > 0:
+                    extra = await asyncio.wait_for(message_queue.get(), timeout)
+                else:
+                    extra = message_queue.get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if extra == "EXIT":
+                exit_requested = True
+                break
+            if batch_chars + len(extra) + 1 > MESSAGE_BATCH_CHARS:
+                carry = extra
+                break
+            batch.append(extra)
+            batch_chars += len(extra) + 1
+
+        await _rate_limiter.acquire(logger)
 
         try:
-            await send_telegram_message(bot, chat_id, message, logger)
-            _sent_timestamps.append(time.time())
+            await send_telegram_message(bot, chat_id, "\n".join(batch), logger)
         except Exception as e:
-            logger.error(f"Ошибка при send_telegram_message: {e}")
+            logger.error("Ошибка при send_telegram_message: %s", e)
         finally:
+            for _ in batch:
+                message_queue.task_done()
+
+        if exit_requested:
+            logger.info("Воркер получил сигнал завершения.")
             message_queue.task_done()
+            break
 
 
 async def run_message_workers(
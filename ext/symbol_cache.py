@@ -0,0 +1,80 @@
+# ext/symbol_cache.py
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import aiohttp
+
+from ext.bybit_api import get_usdt_perpetual_symbols
+from ext.utils import json_loads
+
+SYMBOLS_CACHE_FILE = "symbols_cache.json"
+# Список бессрочных контрактов меняется несколько раз в неделю
+SYMBOLS_CACHE_TTL = int(os.getenv("SYMBOLS_CACHE_TTL", 86400))
+
+logger = logging.getLogger(__name__)
+
+def _load_cached_symbols(cache_file: str, ttl: int) -> Optional[List[str]]:
+    """
+    Возвращает символы из файлового кэша, если они получены меньше ttl секунд назад.
+
+    Свежесть определяется по сохранённому в файле времени запроса (fetched_at),
+    а не по mtime: checkout или копирование файла не делают старый список свежим.
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            data = json_loads(f.read())
+        fetched_at = float(data.get('fetched_at', 0))
+        symbols = data.get('symbols')
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logger.warning("Не удалось прочитать кэш символов %s: %s", cache_file, e)
+        return None
+    if time.time() - fetched_at >= ttl:
+        return None
+    return symbols or None
+
+def _save_cached_symbols(cache_file: str, symbols: List[str]) -> None:
+    """
+    Атомарно сохраняет список символов в файловый кэш.
+
+    Данные пишутся во временный файл рядом с кэшем и подменяют его через
+    os.replace, поэтому параллельный запуск не прочитает недописанный файл.
+    """
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.symbols_', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"fetched_at": time.time(), "symbols": symbols}, f)
+            os.replace(tmp_path, cache_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning("Не удалось сохранить кэш символов %s: %s", cache_file, e)
+
+async def get_symbols_cached(
+    session: aiohttp.ClientSession,
+    ttl: int = SYMBOLS_CACHE_TTL,
+    cache_file: str = SYMBOLS_CACHE_FILE
+) -> List[str]:
+    """
+    Получает список символов USDT Perpetual, используя файловый кэш.
+
+    Запрос к instruments-info делается, только если кэш старше ttl секунд
+    или отсутствует.
+    """
+    symbols = _load_cached_symbols(cache_file, ttl)
+    if symbols is not None:
+        logger.info("Загружено %s символов USDT Perpetual из кэша.", len(symbols))
+        return symbols
+
+    symbols = await get_usdt_perpetual_symbols(session)
+    if symbols:
+        _save_cached_symbols(cache_file, symbols)
+    return symbols
@@ -0,0 +1,101 @@
+# ext/ta_cache.py
+import logging
+import sqlite3
+from typing import Optional
+
+from patterns.macd import MacdState
+
+TA_CACHE_FILE = "ta_cache.sqlite3"
+# Сколько сохранений накапливать в одной транзакции: короткие транзакции не держат
+# блокировку записи весь запуск, а при сбое теряется не больше одной пачки
+TA_CACHE_COMMIT_BATCH = 200
+
+logger = logging.getLogger(__name__)
+
+_connection: Optional[sqlite3.Connection] = None
+_pending_writes = 0
+
+def _get_connection() -> sqlite3.Connection:
+    """
+    Открывает (один раз за запуск) соединение с SQLite-кэшем индикаторов.
+
+    Соединение запоминается только после успешной подготовки схемы: если база
+    занята, следующий вызов попробует открыть её заново.
+    """
+    global _connection
+    if _connection is None:
+        # timeout=0: если базу держит параллельный запуск, запись сразу пропускается
+        # с предупреждением, а не блокирует цикл событий на время ожидания
+        connection = sqlite3.connect(TA_CACHE_FILE, timeout=0)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS macd_state ("
+                " symbol TEXT NOT NULL,"
+                " interval TEXT NOT NULL,"
+                " last_start INTEGER NOT NULL,"
+                " fast_period INTEGER NOT NULL,"
+                " slow_period INTEGER NOT NULL,"
+                " signal_period INTEGER NOT NULL,"
+                " ema_fast REAL NOT NULL,"
+                " ema_slow REAL NOT NULL,"
+                " ema_signal REAL NOT NULL,"
+                " PRIMARY KEY (symbol, interval))"
+            )
+        except sqlite3.Error:
+            connection.close()
+            raise
+        _connection = connection
+    return _connection
+
+def load_macd_state(symbol: str, interval: str) -> Optional[MacdState]:
+    """
+    Возвращает сохранённое состояние MACD для пары (symbol, interval) или None.
+    """
+    try:
+        row = _get_connection().execute(
+            "SELECT last_start, fast_period, slow_period, signal_period, ema_fast, ema_slow, ema_signal"
+            " FROM macd_state WHERE symbol = ? AND interval = ?",
+            (symbol, interval)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Не удалось прочитать кэш MACD для %s на интервале %s: %s", symbol, interval, e)
+        return None
+    return MacdState(*row) if row else None
+
+def save_macd_state(symbol: str, interval: str, state: MacdState) -> None:
+    """
+    Сохраняет состояние MACD. Изменения фиксируются пачками по
+    TA_CACHE_COMMIT_BATCH сохранений и в close_ta_cache().
+    """
+    global _pending_writes
+    try:
+        connection = _get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO macd_state"
+            " (symbol, interval, last_start, fast_period, slow_period, signal_period, ema_fast, ema_slow, ema_signal)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (symbol, interval, *state)
+        )
+        _pending_writes += 1
+        if _pending_writes >= TA_CACHE_COMMIT_BATCH:
+            connection.commit()
+            _pending_writes = 0
+    except sqlite3.Error as e:
+        logger.warning("Не удалось сохранить кэш MACD для %s на интервале %s: %s", symbol, interval, e)
+
+def close_ta_cache() -> None:
+    """
+    Фиксирует оставшиеся изменения и закрывает соединение.
+    """
+    global _connection, _pending_writes
+    if _connection is None:
+        return
+    _pending_writes = 0
+    try:
+        _connection.commit()
+    except sqlite3.Error as e:
+        logger.warning("Не удалось записать кэш индикаторов: %s", e)
+    finally:
+        _connection.close()
+        _connection = None
@@ -1,10 +1,22 @@
 #  ext/utils.py
-import re
-from typing import Pattern
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
 
-ESCAPE_CHARS = r'_*[]()~`>#+\-=\|{}.!'
+try:
+    import orjson
+    # orjson принимает bytes напрямую и разбирает JSON в несколько раз быстрее stdlib
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
-_ESCAPE_MARKDOWN_PATTERN: Pattern = re.compile(f'([{re.escape(ESCAPE_CHARS)}])')
+ESCAPE_CHARS = '_*[]()~`>#+-=|{}.!\\'
+
+# Таблица для str.translate: каждый спецсимвол MarkdownV2 -> '\\' + символ
+_ESCAPE_TABLE: Dict[int, str] = {ord(char): '\\' + char for char in ESCAPE_CHARS}
 
 def escape_markdown(text: str) -> str:
     """
@@ -13,4 +25,40 @@ def escape_markdown(text: str) -> str:
     :param text: Текст для экранирования.
     :return: Экранированный текст.
     """
-    return _ESCAPE_MARKDOWN_PATTERN.sub(r'\\\1', text)
+    return text.translate(_ESCAPE_TABLE)
+
+
+class RateLimiter:
+    """
+    Ограничитель по скользящему окну: не более max_calls вызовов за period секунд.
+
+    Проверка и резервирование слота выполняются под asyncio.Lock, поэтому
+    несколько корутин не могут одновременно проскочить через лимит.
+    """
+
+    def __init__(self, max_calls: int, period: float):
+        self.max_calls = max_calls
+        self.period = period
+        self._timestamps: deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._timestamps and now - self._timestamps[0] >= self.period:
+            self._timestamps.popleft()
+
+    async def acquire(self, logger: Optional[logging.Logger] = None) -> None:
+        """
+        Ждёт свободный слот в окне и резервирует его.
+
+        :param logger: Если задан, в него пишется сообщение об ожидании.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self._timestamps) >= self.max_calls:
+                wait = self.period - (now - self._timestamps[0])
+                if logger is not None:
+                    logger.info("Достигнут лимит %s за %ss. Жду %.1fs.", self.max_calls, self.period, wait)
+                await asyncio.sleep(wait)
+                self._expire(time.monotonic())
+            self._timestamps.append(time.monotonic())
@@ -2,23 +2,34 @@
 
 import os
 import logging
-from typing import List, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
+from ext.candles import Candles
 from patterns.stochastic_oscillator import calculate_stochastic_oscillator
-from patterns.macd import calculate_macd
+from patterns.macd import MacdState, calculate_macd_incremental
 
 logger = logging.getLogger(__name__)
 
+K_PERIOD = int(os.getenv("K_PERIOD", 14))
+D_PERIOD = int(os.getenv("D_PERIOD", 3))
+FAST_PERIOD = int(os.getenv("FAST_PERIOD", 12))
+SLOW_PERIOD = int(os.getenv("SLOW_PERIOD", 26))
+SIGNAL_PERIOD = int(os.getenv("SIGNAL_PERIOD", 9))
+OVERBOUGHT = float(os.getenv("OVERBOUGHT", 90.0))
+OVERSOLD = float(os.getenv("OVERSOLD", 10.0))
+
 def analyze_candles(
-    candles: List[Dict[str, float]],
-    k_period: int = int(os.getenv("K_PERIOD", 14)),
-    d_period: int = int(os.getenv("D_PERIOD", 3)),
-    macd_fast: int = int(os.getenv("FAST_PERIOD", 12)),
-    macd_slow: int = int(os.getenv("SLOW_PERIOD", 26)),
-    macd_signal: int = int(os.getenv("SIGNAL_PERIOD", 9)),
-    overbought: float = float(os.getenv("OVERBOUGHT", 90.0)),
-    oversold: float = float(os.getenv("OVERSOLD", 10.0)),
-) -> Dict[str, Optional[float]]:
+    candles: Candles,
+    k_period: int = K_PERIOD,
+    d_period: int = D_PERIOD,
+    macd_fast: int = FAST_PERIOD,
+    macd_slow: int = SLOW_PERIOD,
+    macd_signal: int = SIGNAL_PERIOD,
+    overbought: float = OVERBOUGHT,
+    oversold: float = OVERSOLD,
+    macd_state: Optional[MacdState] = None,
+    stochastic: Optional[Tuple[Optional[float], Optional[float]]] = None,
+) -> Dict[str, Any]:
     """
     Анализирует свечи на основе стохастического осциллятора и MACD.
 
@@ -27,21 +38,26 @@ def analyze_candles(
       - 'short', если %K > overbought и MACD < 0
       - None в остальных случаях
 
+    Если передан macd_state из прошлого запуска, EMA для MACD продолжаются
+    с него; обновлённое состояние возвращается под ключом "macd_state".
+    Если передан stochastic — уже рассчитанные (%K, %D) для последней свечи
+    (например, из StochasticState), — стохастик по окну не пересчитывается.
     """
-    analysis: Dict[str, Optional[float]] = {}
+    analysis: Dict[str, Any] = {}
 
     # Стохастик
-    percent_k, percent_d = calculate_stochastic_oscillator(candles, k_period, d_period)
+    if stochastic is None:
+        stochastic = calculate_stochastic_oscillator(candles, k_period, d_period)
+    percent_k, percent_d = stochastic
     analysis["%K"] = percent_k
     analysis["%D"] = percent_d
 
     # MACD
-    macd_line, signal_line, histogram = calculate_macd(
-        candles, fast_period=macd_fast, slow_period=macd_slow, signal_period=macd_signal
+    (last_macd, _, _), new_macd_state = calculate_macd_incremental(
+        candles, macd_state, fast_period=macd_fast, slow_period=macd_slow, signal_period=macd_signal
     )
-    # берём последнее значение MACD‑линии
-    last_macd = macd_line[-1] if isinstance(macd_line, list) else macd_line
     analysis["MACD"] = last_macd
+    analysis["macd_state"] = new_macd_state
 
     # Определяем сигнал
     signal: Optional[str] = None
@@ -53,5 +69,5 @@ def analyze_candles(
 
     analysis["signal"] = signal
 
-    logger.info("Анализ завершён. Результат: %r", analysis)
+    logger.debug("Анализ завершён. Результат: %r", analysis)
     return analysis
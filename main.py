@@ -5,140 +5,383 @@ import aiohttp
 from datetime import datetime
 from dotenv import load_dotenv
 from telegram import Bot
-from ext.bybit_api import get_usdt_perpetual_symbols, get_kline_with_retries
-from helpers import analyze_candles
+from ext.bybit_api import get_kline_with_retries
+from ext.bybit_ws import stream_klines
+from ext.symbol_cache import get_symbols_cached
+from ext.candles import Candle, CandleBuffer, Candles, parse_klines
+from ext.ta_cache import load_macd_state, save_macd_state, close_ta_cache
+from helpers import analyze_candles, K_PERIOD, D_PERIOD, FAST_PERIOD, SLOW_PERIOD, SIGNAL_PERIOD
+from patterns.macd import MacdState, macd_resume_index
+from patterns.stochastic_oscillator import StochasticState
 from ext.messaging import run_message_workers, send_telegram_message
 from ext.logging_config import setup_logger
-from collections import defaultdict
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, FrozenSet, List, Optional, Tuple
 import logging 
 
+try:
+    import uvloop
+except ImportError:
+    # uvloop недоступен (например, на Windows) — работаем на стандартном цикле asyncio
+    uvloop = None
+
 class SharedState:
     def __init__(self, message_limit: int):
         self.message_limit: int = message_limit
         self.messages_sent: int = 0
-        self.lock: asyncio.Lock = asyncio.Lock()
         self.limit_reached_event: asyncio.Event = asyncio.Event()
 
+    def reserve_message_slot(self) -> bool:
+        """
+        Резервирует место под одно сообщение.
+
+        Возвращает False, если лимит уже исчерпан; message_limit <= 0 означает
+        отсутствие лимита. Событие limit_reached_event выставляется сразу при
+        занятии последнего слота, чтобы остальные символы прекращали работу,
+        не дожидаясь своих запросов.
+
+        Между проверкой и увеличением счётчика нет await, поэтому в одном
+        цикле событий операция атомарна и блокировка не нужна.
+        """
+        if self.message_limit <= 0:
+            return True
+        if self.messages_sent >= self.message_limit:
+            self.limit_reached_event.set()
+            return False
+        self.messages_sent += 1
+        if self.messages_sent >= self.message_limit:
+            self.limit_reached_event.set()
+        return True
+
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 CHAT_ID = os.getenv('CHAT_ID')
 
-MESSAGE_LIMIT = 20
+# Сигналы склеиваются в пачки, поэтому по умолчанию число отчётов за запуск не ограничено
+MESSAGE_LIMIT = int(os.getenv('MESSAGE_LIMIT', 0))
 MANUAL_RUN = os.getenv('MANUAL_RUN', 'false').lower() == 'true'
+# Постоянный режим: закрытые свечи приходят по WebSocket, анализ — на закрытии свечи
+STREAM_MODE = os.getenv('STREAM_MODE', 'false').lower() == 'true'
+
+# Полная история для расчёта MACD с нуля (+1 незакрытая свеча)
+KLINE_LIMIT = 36
+# При наличии кэша EMA достаточно окна стохастика (+1 незакрытая свеча)
+WARM_KLINE_LIMIT = K_PERIOD + D_PERIOD
+
+INTERVALS: Dict[str, str] = {
+    # '5': '5m',
+    # '15': '15m',
+    '30': '30m',
+    '60': '1h',
+    '240': '4h',
+    # '720': '12h',
+}
+
+# Порядок интервалов в сообщении (результаты приходят в порядке готовности)
+_INTERVAL_ORDER: Dict[str, int] = {'5m': 0, '15m': 1, '30m': 2, '1h': 3, '4h': 4, '12h': 5, '1d': 6}
+_ACTION_EMOJI = (("LONG", "🟢"), ("SHORT", "🔴"))
+
+# Расписание: (шаг минут, шаг часов) текущего запуска -> допустимые интервалы
+SCHEDULES: Dict[Tuple[int, int], FrozenSet[str]] = {
+    (60, 12): frozenset({'5', '15', '30', '60', '240', '720', '1440'}),
+    (60, 4): frozenset({'5', '15', '30', '60', '240'}),
+    (60, 0): frozenset({'5', '15', '30', '60'}),
+    (30, 0): frozenset({'5', '15', '30'}),
+    (15, 0): frozenset({'5', '15'}),
+    (5, 0): frozenset({'5'}),
+}
+
+def _schedule_key(hour: int, minute: int) -> Optional[Tuple[int, int]]:
+    """
+    Возвращает ключ SCHEDULES для времени запуска или None, если время не кратно 5 минутам.
+    """
+    if minute == 0:
+        return (60, 12) if hour % 12 == 0 else (60, 4) if hour % 4 == 0 else (60, 0)
+    for step in (30, 15, 5):
+        if minute % step == 0:
+            return step, 0
+    return None
 
 if not BOT_TOKEN or not CHAT_ID:
     raise ValueError("BOT_TOKEN и CHAT_ID должны быть установлены в .env файле.")
 
-setup_logger(log_file='app.log', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def load_candles(
+    session: aiohttp.ClientSession,
+    symbol: str,
+    interval_key: str,
+    interval_value: str,
+    limit: int
+) -> Optional[Candles]:
+    """
+    Загружает limit свечей и возвращает закрытые (без последней, ещё открытой) в виде Candles.
+    """
+    kline_data = await get_kline_with_retries(session, symbol, interval_key, limit=limit)
+    if not kline_data:
+        logger.warning("Нет данных свечей для %s на интервале %s.", symbol, interval_value)
+        return None
+
+    try:
+        candles = parse_klines(kline_data[:-1])
+    except (ValueError, TypeError, IndexError) as e:
+        logger.error("Ошибка конвертации свечей для %s: %s", symbol, e)
+        return None
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Преобразованные свечи для %s: %s", symbol, candles)
+
+    return candles
+
+def signal_entry(analysis: Dict[str, Any], interval_value: str) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает описание сигнала (действие, интервал, %K, %D, MACD) из результата analyze_candles или None.
+    """
+    signal = analysis.get('signal')
+    if not signal:
+        return None
+    return {
+        "action":   "SHORT" if signal == "short" else "LONG",
+        "interval": interval_value,
+        "k":        analysis["%K"],
+        "d":        analysis["%D"],
+        "macd":     analysis["MACD"],
+    }
+
+def build_message(symbol: str, entries_by_action: Dict[str, List[Dict[str, Any]]]) -> str:
+    """
+    Собирает текст сообщения по сигналам символа, сгруппированным по действию.
+    """
+    message_lines = [f"#{symbol}"]
+    for action, emoji in _ACTION_EMOJI:
+        entries = entries_by_action.get(action, [])
+        entries.sort(key=lambda e: _INTERVAL_ORDER.get(e["interval"], 99))
+        for e in entries:
+            iv = e["interval"]
+            k  = e["k"]
+            d  = e["d"]
+            m  = e["macd"]
+            message_lines.append(
+                f"{emoji} {action} {iv} — K={k:.2f}, D={d:.2f}, MACD={m:.6f}"
+            )
+
+    return "\n".join(message_lines) + "\n"
+
 async def fetch_and_analyze(
     symbol: str,
     interval_key: str,
     interval_value: str,
     session: aiohttp.ClientSession,
-    signals: defaultdict,
     shared_state: SharedState
-) -> None:
+) -> Optional[Dict[str, Any]]:
     """
     Получает данные свечей и анализирует их для заданного символа и интервала.
+
+    Возвращает описание сигнала (действие, интервал, %K, %D, MACD) или None.
     """
     if shared_state.limit_reached_event.is_set():
-        return
+        return None
 
     try:
-        kline_data = await get_kline_with_retries(session, symbol, interval_key, limit=36)
-        if not kline_data:
-            logger.warning(f"Нет данных свечей для {symbol} на интервале {interval_value}.")
-            return
+        macd_state = load_macd_state(symbol, interval_key)
+        limit = WARM_KLINE_LIMIT if macd_state is not None else KLINE_LIMIT
 
-        fields = ['start', 'open', 'high', 'low', 'close', 'volume']
-        
-        candles = []
-        for candle in kline_data[:-1]:
-            candle_dict = dict(zip(fields, candle))
-            try:
-                candle_dict['open'] = float(candle_dict['open'])
-                candle_dict['high'] = float(candle_dict['high'])
-                candle_dict['low'] = float(candle_dict['low'])
-                candle_dict['close'] = float(candle_dict['close'])
-                candle_dict['volume'] = float(candle_dict['volume'])
-            except ValueError as ve:
-                logger.error(f"Ошибка конвертации числовых значений для {symbol}: {ve}")
-                continue
-            candles.append(candle_dict)
-
-        logger.debug(f"Преобразованные свечи для {symbol}: {candles}")
-
-        for candle in candles:
-            if not all(key in candle for key in ['start', 'open', 'high', 'low', 'close', 'volume']):
-                logger.error(f"Недостающие ключи в свече для {symbol}: {candle}")
-                return
-            if not all(isinstance(candle[key], (int, float)) for key in ['open', 'high', 'low', 'close', 'volume']):
-                logger.error(f"Некорректные типы данных в свече для {symbol}: {candle}")
-                return
+        candles = await load_candles(session, symbol, interval_key, interval_value, limit)
+        if candles is None:
+            return None
 
-        analysis = analyze_candles(candles)
+        if macd_state is not None and macd_resume_index(
+            macd_state, candles, FAST_PERIOD, SLOW_PERIOD, SIGNAL_PERIOD
+        ) is None:
+            # Кэш не стыкуется с окном (пропущенные запуски) — нужна полная история
+            candles = await load_candles(session, symbol, interval_key, interval_value, KLINE_LIMIT)
+            if candles is None:
+                return None
 
-        signal = analysis.get('signal')
+        analysis = analyze_candles(candles, macd_state=macd_state)
+        if analysis["macd_state"] is not None:
+            save_macd_state(symbol, interval_key, analysis["macd_state"])
 
-        if signal:
-            trade_action = "SHORT" if signal == "short" else "LONG"
-            signals[trade_action].append({
-                "interval": interval_value,
-                "k":    analysis["%K"],
-                "d":    analysis["%D"],
-                "macd": analysis["MACD"],
-            })
+        return signal_entry(analysis, interval_value)
 
     except aiohttp.ClientResponseError as e:
-        logger.error(f"Ошибка при получении данных свечей для {symbol}: {e.status}, {e.message}, URL: {e.request_info.url}")
+        logger.error("Ошибка при получении данных свечей для %s: %s, %s, URL: %s", symbol, e.status, e.message, e.request_info.url)
     except aiohttp.ContentTypeError as e:
-        logger.error(f"Неверный тип содержимого при получении данных для {symbol}: {e}")
+        logger.error("Неверный тип содержимого при получении данных для %s: %s", symbol, e)
     except Exception as e:
-        logger.error(f"Ошибка при обработке символа {symbol} на интервале {interval_value}: {e}")
+        logger.error("Ошибка при обработке символа %s на интервале %s: %s", symbol, interval_value, e)
+
+    return None
 
 async def process_symbol(
     symbol: str,
     intervals: Dict[str, str],
     session: aiohttp.ClientSession,
-    semaphore: asyncio.Semaphore,
     message_queue: asyncio.Queue,
     shared_state: SharedState
 ) -> None:
     """
     Обрабатывает символ на указанных интервалах и объединяет сигналы для одного символа.
     """
-    async with semaphore:
-        if shared_state.limit_reached_event.is_set():
+    if shared_state.limit_reached_event.is_set():
+        return
+
+    entries_by_action: Dict[str, List[Dict[str, Any]]] = {"LONG": [], "SHORT": []}
+    tasks = [
+        fetch_and_analyze(symbol, interval_key, interval_value, session, shared_state)
+        for interval_key, interval_value in intervals.items()
+    ]
+
+    # Результаты забираются по мере готовности, а не после самого медленного интервала
+    for next_result in asyncio.as_completed(tasks):
+        entry = await next_result
+        if entry is not None:
+            entries_by_action[entry["action"]].append(entry)
+
+    if not entries_by_action["LONG"] and not entries_by_action["SHORT"]:
+        return
+
+    if not shared_state.reserve_message_slot():
+        logger.info("Лимит сообщений исчерпан, сигнал по %s не отправлен.", symbol)
+        return
+
+    await message_queue.put(build_message(symbol, entries_by_action))
+
+async def symbol_worker(
+    symbol_queue: asyncio.Queue,
+    intervals: Dict[str, str],
+    session: aiohttp.ClientSession,
+    message_queue: asyncio.Queue,
+    shared_state: SharedState
+) -> None:
+    """
+    Воркер, извлекающий символы из очереди и обрабатывающий их по одному.
+    Число воркеров задаёт параллелизм вместо отдельного семафора.
+
+    Очередь заполняется целиком до запуска воркеров, поэтому пустая очередь
+    означает конец работы и сигнальные None не нужны.
+    """
+    while True:
+        try:
+            symbol = symbol_queue.get_nowait()
+        except asyncio.QueueEmpty:
             return
+        await process_symbol(symbol, intervals, session, message_queue, shared_state)
 
-        signals = defaultdict(list)
-        tasks = [
-            fetch_and_analyze(symbol, interval_key, interval_value, session, signals, shared_state)
-            for interval_key, interval_value in intervals.items()
-        ]
+async def handle_closed_candle(
+    symbol: str,
+    interval_key: str,
+    candle: Candle,
+    intervals: Dict[str, str],
+    session: aiohttp.ClientSession,
+    message_queue: asyncio.Queue,
+    shared_state: SharedState,
+    buffers: Dict[Tuple[str, str], CandleBuffer],
+    macd_states: Dict[Tuple[str, str], Optional[MacdState]],
+    stoch_states: Dict[Tuple[str, str], StochasticState]
+) -> None:
+    """
+    Добавляет закрывшуюся свечу в кольцевой буфер (символ, интервал) и анализирует окно.
 
-        await asyncio.gather(*tasks)
+    История загружается по REST при первой свече и после пропуска свечей
+    (например, из-за переподключения WebSocket); дальше окно сдвигается без запросов,
+    а стохастик и EMA для MACD продолжаются инкрементально.
+    """
+    interval_value = intervals.get(interval_key)
+    if interval_value is None:
+        return
 
-        if not signals:
+    key = (symbol, interval_key)
+    try:
+        buffer = buffers.get(key)
+        step_ms = int(interval_key) * 60_000
+        if buffer is None or (buffer and candle.start > buffer.start[-1] + step_ms):
+            candles = await load_candles(session, symbol, interval_key, interval_value, KLINE_LIMIT)
+            if candles is None:
+                return
+            buffer = CandleBuffer(KLINE_LIMIT - 1, candles)
+            buffers[key] = buffer
+            macd_states.pop(key, None)
+
+            stoch_state = StochasticState(K_PERIOD, D_PERIOD)
+            stoch_states[key] = stoch_state
+            stochastic: Tuple[Optional[float], Optional[float]] = (None, None)
+            for high, low, close in zip(buffer.high, buffer.low, buffer.close):
+                stochastic = stoch_state.push(high, low, close)
+
+            # REST мог уже вернуть эту свечу закрытой
+            if not buffer or candle.start > buffer.start[-1]:
+                buffer.append(candle)
+                stochastic = stoch_state.push(candle.high, candle.low, candle.close)
+        else:
+            # Повтор или устаревшая свеча — уже учтена
+            if buffer and candle.start <= buffer.start[-1]:
+                return
+            buffer.append(candle)
+            stochastic = stoch_states[key].push(candle.high, candle.low, candle.close)
+
+        analysis = analyze_candles(
+            buffer.to_candles(), macd_state=macd_states.get(key), stochastic=stochastic
+        )
+        macd_states[key] = analysis["macd_state"]
+
+        entry = signal_entry(analysis, interval_value)
+        if entry is None:
             return
+        if not shared_state.reserve_message_slot():
+            logger.info("Лимит сообщений исчерпан, сигнал по %s не отправлен.", symbol)
+            return
+        await message_queue.put(build_message(symbol, {entry["action"]: [entry]}))
 
-        message_lines = [f"#{symbol}"]
-        for action, entries in signals.items():
-            emoji = "🟢" if action == "LONG" else "🔴"
-            for e in entries:
-                iv = e["interval"]
-                k  = e["k"]
-                d  = e["d"]
-                m  = e["macd"]
-                message_lines.append(
-                    f"{emoji} {action} {iv} — K={k:.2f}, D={d:.2f}, MACD={m:.6f}"
-                )
+    except Exception as e:
+        logger.error("Ошибка при обработке свечи %s на интервале %s: %s", symbol, interval_value, e)
 
-        message = "\n".join(message_lines) + "\n"
-    await message_queue.put(message)
+async def stream_worker(
+    kline_queue: asyncio.Queue,
+    intervals: Dict[str, str],
+    session: aiohttp.ClientSession,
+    message_queue: asyncio.Queue,
+    shared_state: SharedState,
+    buffers: Dict[Tuple[str, str], CandleBuffer],
+    macd_states: Dict[Tuple[str, str], Optional[MacdState]],
+    stoch_states: Dict[Tuple[str, str], StochasticState]
+) -> None:
+    """
+    Воркер, обрабатывающий закрытые свечи из WebSocket-потока.
+    """
+    while True:
+        symbol, interval_key, candle = await kline_queue.get()
+        await handle_closed_candle(
+            symbol, interval_key, candle, intervals, session, message_queue, shared_state,
+            buffers, macd_states, stoch_states
+        )
+
+async def run_stream(
+    symbols: List[str],
+    intervals: Dict[str, str],
+    session: aiohttp.ClientSession,
+    message_queue: asyncio.Queue,
+    shared_state: SharedState,
+    max_workers: int
+) -> None:
+    """
+    Постоянный режим: одна WebSocket-подписка на все пары (символ, интервал)
+    вместо REST-опроса по расписанию. Работает до остановки процесса.
+    """
+    kline_queue: asyncio.Queue = asyncio.Queue()
+    buffers: Dict[Tuple[str, str], CandleBuffer] = {}
+    macd_states: Dict[Tuple[str, str], Optional[MacdState]] = {}
+    stoch_states: Dict[Tuple[str, str], StochasticState] = {}
+
+    await asyncio.gather(
+        stream_klines(symbols, list(intervals), kline_queue),
+        *(
+            stream_worker(
+                kline_queue, intervals, session, message_queue, shared_state,
+                buffers, macd_states, stoch_states
+            )
+            for _ in range(max_workers)
+        )
+    )
 
 async def main() -> None:
     """
@@ -151,84 +394,103 @@ async def main() -> None:
     current_minute = current_time.minute
     current_hour = current_time.hour
 
-    intervals = {
-        # '5': '5m',
-        # '15': '15m',
-        '30': '30m',
-        '60': '1h',
-        '240': '4h',
-        # '720': '12h',
-    }
+    intervals = INTERVALS
 
-    if not is_manual_run:
-        if current_minute % 60 == 0:
-            if current_hour % 12 == 0 and current_minute == 0:
-                intervals = {k: v for k, v in intervals.items() if k in ['5', '15', '30', '60', '240', '720', '1440']}
-            elif current_hour % 4 == 0 and current_minute == 0:
-                intervals = {k: v for k, v in intervals.items() if k in ['5', '15', '30', '60', '240']}
-            else:
-                intervals = {k: v for k, v in intervals.items() if k in ['5', '15', '30', '60']}
-        elif current_minute % 30 == 0:
-            intervals = {k: v for k, v in intervals.items() if k in ['5', '15', '30']}
-        elif current_minute % 15 == 0:
-            intervals = {k: v for k, v in intervals.items() if k in ['5', '15']}
-        elif current_minute % 5 == 0:
-            intervals = {k: v for k, v in intervals.items() if k in ['5']}
-        else:
+    if not is_manual_run and not STREAM_MODE:
+        allowed = SCHEDULES.get(_schedule_key(current_hour, current_minute))
+        if allowed is None:
             logger.info("Запуск в неправильное время.")
             return
+        intervals = {k: v for k, v in INTERVALS.items() if k in allowed}
 
     MAX_CONCURRENT_TASKS = 50
-    MAX_WORKERS = 15
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+    # Один воркер: пока он ждёт лимит Telegram, новые сигналы копятся в очереди в следующую пачку
+    MAX_WORKERS = 1
     message_queue = asyncio.Queue()
 
     shared_state = SharedState(message_limit=MESSAGE_LIMIT)
 
-    async with aiohttp.ClientSession() as session:
-        excluded_symbols = {'USDCUSDT', 'FDUSDUSDT'}
+    # Один пул keep-alive соединений на весь запуск: TLS-рукопожатие делается
+    # один раз на соединение, а не на каждый запрос свечей.
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT_TASKS,
+        limit_per_host=MAX_CONCURRENT_TASKS,
+        ttl_dns_cache=300,
+        enable_cleanup_closed=True,
+        keepalive_timeout=75
+    )
+    timeout = aiohttp.ClientTimeout(total=15, connect=5)
+
+    # Кэш MACD фиксируется и при аварийном завершении, чтобы не терять сохранённое за запуск
+    try:
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            raise_for_status=True
+        ) as session:
+            excluded_symbols = {'USDCUSDT', 'FDUSDUSDT'}
+
+            symbols = await get_symbols_cached(session)
+            symbols = [symbol for symbol in symbols if symbol.upper() not in excluded_symbols]
+
+            if not symbols:
+                async with Bot(token=BOT_TOKEN) as bot:
+                    await send_telegram_message(bot, CHAT_ID, "❌ Список символов пуст.", logger)
+                return
 
-        symbols = await get_usdt_perpetual_symbols(session)
-        symbols = [symbol for symbol in symbols if symbol.upper() not in excluded_symbols]
+            # Если хотите протестировать на конкретном символе, раскомментируйте блок ниже
+            # if len(symbols) >= 10:
+            #     test_symbol = symbols[9]  # Индексация с 0
+            #     symbols = [test_symbol]
+            #     logger.info("Тестирование на символе: %s", test_symbol)
+            # else:
+            #     logger.warning("В списке символов меньше 10 элементов. Будет обработан первый символ.")
+            #     symbols = [symbols[0]]
 
-        if not symbols:
+            # Инициализация бота внутри main для правильного управления жизненным циклом
             async with Bot(token=BOT_TOKEN) as bot:
-                await send_telegram_message(bot, CHAT_ID, "❌ Список символов пуст.", logger)
-            return
-
-        # Если хотите протестировать на конкретном символе, раскомментируйте блок ниже
-        # if len(symbols) >= 10:
-        #     test_symbol = symbols[9]  # Индексация с 0
-        #     symbols = [test_symbol]
-        #     logger.info(f"Тестирование на символе: {test_symbol}")
-        # else:
-        #     logger.warning("В списке символов меньше 10 элементов. Будет обработан первый символ.")
-        #     symbols = [symbols[0]]
-
-        # Инициализация бота внутри main для правильного управления жизненным циклом
-        async with Bot(token=BOT_TOKEN) as bot:
-            worker_task = asyncio.create_task(
-                run_message_workers(
-                    bot,
-                    CHAT_ID,
-                    message_queue,
-                    logger,
-                    max_workers=MAX_WORKERS
+                worker_task = asyncio.create_task(
+                    run_message_workers(
+                        bot,
+                        CHAT_ID,
+                        message_queue,
+                        logger,
+                        max_workers=MAX_WORKERS
+                    )
                 )
-            )
 
-            tasks = [
-                process_symbol(symbol, intervals, session, semaphore, message_queue, shared_state)
-                for symbol in symbols
-            ]
+                if STREAM_MODE:
+                    await run_stream(symbols, intervals, session, message_queue, shared_state, MAX_CONCURRENT_TASKS)
+                    return
+
+                symbol_queue: asyncio.Queue = asyncio.Queue()
+                for symbol in symbols:
+                    symbol_queue.put_nowait(symbol)
+
+                # Фиксированный пул воркеров: в памяти одновременно не больше
+                # MAX_CONCURRENT_TASKS символов
+                symbol_workers = [
+                    asyncio.create_task(
+                        symbol_worker(symbol_queue, intervals, session, message_queue, shared_state)
+                    )
+                    for _ in range(min(MAX_CONCURRENT_TASKS, len(symbols)))
+                ]
 
-            await asyncio.gather(*tasks)
+                await asyncio.gather(*symbol_workers)
 
-            for _ in range(MAX_WORKERS):
-                await message_queue.put("EXIT")
+                for _ in range(MAX_WORKERS):
+                    await message_queue.put("EXIT")
 
-            await worker_task
+                await worker_task
+    finally:
+        close_ta_cache()
 
 if __name__ == "__main__":
-    setup_logger(log_file='app.log', level=logging.INFO)
-    asyncio.run(main())
+    log_listener = setup_logger(log_file='app.log', level=logging.INFO)
+    try:
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
+    finally:
+        log_listener.stop()
@@ -1,52 +1,58 @@
 # engulfing.py
 import logging
-from typing import List, Dict, Optional
+from typing import Optional
+
+from ext.candles import Candles
 
 logger = logging.getLogger(__name__)
 
-def check_engulfing_pattern(candles: List[Dict[str, float]]) -> Optional[str]:
+def check_engulfing_pattern(candles: Candles) -> Optional[str]:
     """
     Проверяет паттерн поглощения (бычье или медвежье) на основе последних 5 свечей.
     """
     analysis = None
 
     # Предполагается, что свечи отсортированы от старых к новым
-    last_candle = candles[-1]
-    prev_candle = candles[-2]
+    opens, closes, starts = candles.open, candles.close, candles.start
+    last_open, last_close, last_start = opens[-1], closes[-1], starts[-1]
+    prev_open, prev_close, prev_start = opens[-2], closes[-2], starts[-2]
 
     # Определение тел свечей
-    last_body = last_candle['close'] - last_candle['open']
-    prev_body = prev_candle['close'] - prev_candle['open']
+    last_body = last_close - last_open
+    prev_body = prev_close - prev_open
 
-    logger.debug(f"Предыдущая свеча: Start={prev_candle['start']}, Open={prev_candle['open']}, "
-                 f"Close={prev_candle['close']}, Body={prev_body}")
-    logger.debug(f"Последняя свеча: Start={last_candle['start']}, Open={last_candle['open']}, "
-                 f"Close={last_candle['close']}, Body={last_body}")
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug("Предыдущая свеча: Start=%s, Open=%s, Close=%s, Body=%s",
+                     prev_start, prev_open, prev_close, prev_body)
+        logger.debug("Последняя свеча: Start=%s, Open=%s, Close=%s, Body=%s",
+                     last_start, last_open, last_close, last_body)
 
     # Проверка на бычье поглощение
     bullish_engulfing = (
         prev_body < 0 and  # Предыдущая свеча была медвежьей
         last_body > 0 and  # Последняя свеча была бычьей
-        last_candle['open'] <= prev_candle['close'] and
-        last_candle['close'] > prev_candle['open']
+        last_open <= prev_close and
+        last_close > prev_open
     )
 
     # Проверка на медвежье поглощение
     bearish_engulfing = (
         prev_body > 0 and  # Предыдущая свеча была бычьей
         last_body < 0 and  # Последняя свеча была медвежьей
-        last_candle['open'] >= prev_candle['close'] and
-        last_candle['close'] < prev_candle['open']
+        last_open >= prev_close and
+        last_close < prev_open
     )
 
-    logger.debug(f"Bullish Engulfing: {bullish_engulfing}")
-    logger.debug(f"Bearish Engulfing: {bearish_engulfing}")
+    if debug_enabled:
+        logger.debug("Bullish Engulfing: %s", bullish_engulfing)
+        logger.debug("Bearish Engulfing: %s", bearish_engulfing)
 
     if bullish_engulfing:
         analysis = 'long'
-        logger.info(f"Сигнал: LONG (Engulfing) для свечи {last_candle['start']}")
+        logger.info("Сигнал: LONG (Engulfing) для свечи %s", last_start)
     elif bearish_engulfing:
         analysis = 'short'
-        logger.info(f"Сигнал: SHORT (Engulfing) для свечи {last_candle['start']}")
+        logger.info("Сигнал: SHORT (Engulfing) для свечи %s", last_start)
 
     return analysis
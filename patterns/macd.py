@@ -1,55 +1,138 @@
 # macd.py
-from typing import List, Dict, Tuple, Optional
+from typing import List, NamedTuple, Sequence, Tuple, Optional
 
-def calculate_macd(candles: List[Dict[str, float]], fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+from ext.candles import Candles
+
+class MacdState(NamedTuple):
     """
-    Рассчитывает MACD, сигнальную линию и гистограмму.
+    Значения EMA после свечи last_start. Позволяет продолжить расчёт MACD
+    по новым свечам, не пересчитывая всю историю.
     """
-    if len(candles) < slow_period + signal_period:
-        return None, None, None
+    last_start: int
+    fast_period: int
+    slow_period: int
+    signal_period: int
+    ema_fast: float
+    ema_slow: float
+    ema_signal: float
 
-    closes = [float(candle['close']) for candle in candles]
-
-    def calculate_ema(data: List[float], period: int) -> List[Optional[float]]:
-        ema = []
-        multiplier = 2 / (period + 1)
-        for i in range(len(data)):
-            if i < period - 1:
-                ema.append(None)
-            elif i == period - 1:
-                sma = sum(data[:period]) / period
-                ema.append(sma)
-            else:
-                ema_value = (data[i] - ema[-1]) * multiplier + ema[-1]
-                ema.append(ema_value)
-        return ema
+def calculate_ema(data: Sequence[float], period: int) -> List[float]:
+    """
+    Рассчитывает EMA без заполнения None: первый элемент результата
+    соответствует индексу period - 1 исходных данных и равен SMA за period.
+    """
+    if len(data) < period:
+        return []
+    multiplier = 2 / (period + 1)
+    value = sum(data[:period]) / period
+    ema = [value]
+    for i in range(period, len(data)):
+        value = (data[i] - value) * multiplier + value
+        ema.append(value)
+    return ema
 
+def _calculate_macd_emas(
+    closes: Sequence[float],
+    fast_period: int,
+    slow_period: int,
+    signal_period: int
+) -> Optional[Tuple[float, float, float]]:
+    """
+    Считает быструю, медленную и сигнальную EMA с нуля и возвращает их последние значения.
+    """
     ema_fast = calculate_ema(closes, fast_period)
     ema_slow = calculate_ema(closes, slow_period)
 
-    macd_line = []
-    for fast, slow in zip(ema_fast, ema_slow):
-        if fast is None or slow is None:
-            macd_line.append(None)
-        else:
-            macd_line.append(fast - slow)
+    # Обе EMA заканчиваются на последней свече — выравниваем их по концу
+    overlap = min(len(ema_fast), len(ema_slow))
+    macd_line = [
+        fast - slow
+        for fast, slow in zip(ema_fast[len(ema_fast) - overlap:], ema_slow[len(ema_slow) - overlap:])
+    ]
 
-    valid_macd = [m for m in macd_line if m is not None]
+    if len(macd_line) < signal_period:
+        return None
 
-    if len(valid_macd) < signal_period:
-        return None, None, None
+    ema_signal = calculate_ema(macd_line, signal_period)
+    return ema_fast[-1], ema_slow[-1], ema_signal[-1]
 
-    ema_signal = calculate_ema(valid_macd, signal_period)
+def calculate_macd(candles: Candles, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """
+    Рассчитывает MACD, сигнальную линию и гистограмму.
+    """
+    if len(candles) < slow_period + signal_period:
+        return None, None, None
 
-    histogram = []
-    for m, s in zip(valid_macd, ema_signal):
-        if m is None or s is None:
-            histogram.append(None)
-        else:
-            histogram.append(m - s)
+    emas = _calculate_macd_emas(candles.close, fast_period, slow_period, signal_period)
+    if emas is None:
+        return None, None, None
 
-    last_macd = valid_macd[-1] if valid_macd else None
-    last_signal = ema_signal[-1] if ema_signal else None
-    last_histogram = histogram[-1] if histogram else None
+    ema_fast, ema_slow, last_signal = emas
+    last_macd = ema_fast - ema_slow
+    last_histogram = last_macd - last_signal
 
     return last_macd, last_signal, last_histogram
+
+def macd_resume_index(
+    state: Optional[MacdState],
+    candles: Candles,
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9
+) -> Optional[int]:
+    """
+    Возвращает индекс первой свечи после state.last_start или None, если
+    состояние нельзя продолжить (другие периоды или свечи state.last_start нет в окне).
+    """
+    if state is None or (state.fast_period, state.slow_period, state.signal_period) != (
+        fast_period, slow_period, signal_period
+    ):
+        return None
+    starts = candles.start
+    # Сохранённая свеча обычно среди последних, поэтому ищем с конца
+    for i in range(len(starts) - 1, -1, -1):
+        if starts[i] == state.last_start:
+            return i + 1
+        if starts[i] < state.last_start:
+            break
+    return None
+
+def calculate_macd_incremental(
+    candles: Candles,
+    state: Optional[MacdState],
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9
+) -> Tuple[Tuple[Optional[float], Optional[float], Optional[float]], Optional[MacdState]]:
+    """
+    Рассчитывает MACD, продолжая EMA из сохранённого состояния.
+
+    Если состояние применимо, обрабатываются только свечи новее state.last_start;
+    иначе MACD считается с нуля по всем свечам. Возвращает (MACD, сигнальная линия,
+    гистограмма) и новое состояние для последней свечи (None, если свечей не хватило).
+    """
+    index = macd_resume_index(state, candles, fast_period, slow_period, signal_period)
+    if index is None:
+        if len(candles) < slow_period + signal_period:
+            return (None, None, None), None
+        emas = _calculate_macd_emas(candles.close, fast_period, slow_period, signal_period)
+        if emas is None:
+            return (None, None, None), None
+        ema_fast, ema_slow, ema_signal = emas
+    else:
+        ema_fast, ema_slow, ema_signal = state.ema_fast, state.ema_slow, state.ema_signal
+        fast_multiplier = 2 / (fast_period + 1)
+        slow_multiplier = 2 / (slow_period + 1)
+        signal_multiplier = 2 / (signal_period + 1)
+        closes = candles.close
+        for i in range(index, len(closes)):
+            price = closes[i]
+            ema_fast = (price - ema_fast) * fast_multiplier + ema_fast
+            ema_slow = (price - ema_slow) * slow_multiplier + ema_slow
+            ema_signal = ((ema_fast - ema_slow) - ema_signal) * signal_multiplier + ema_signal
+
+    last_macd = ema_fast - ema_slow
+    new_state = MacdState(
+        candles.start[-1], fast_period, slow_period, signal_period, ema_fast, ema_slow, ema_signal
+    )
+    return (last_macd, ema_signal, last_macd - ema_signal), new_state
@@ -1,8 +1,127 @@
 # stochastic_oscillator.py
-from typing import List, Dict, Tuple, Optional
+import math
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Tuple, Optional
+
+from ext.candles import Candles
+
+# Через сколько обновлений StochasticState пересчитывает сумму %K заново
+_RESYNC_INTERVAL = 1_000_000
+
+# При малом числе окон встроенные max/min по срезам (цикл на C) быстрее
+# поддержки монотонной очереди в Python; порог подобран замером
+_DIRECT_SCAN_WINDOWS = 4
+
+def _sliding_max(values: List[float], period: int) -> List[float]:
+    """
+    Максимумы всех окон длины period в values (len(values) - period + 1 значений).
+
+    Если окон не больше _DIRECT_SCAN_WINDOWS, каждое просматривается встроенным max.
+    Иначе используется монотонная очередь индексов: значения в ней убывают, поэтому
+    максимум окна всегда в голове, а каждый индекс добавляется и удаляется не больше
+    одного раза (O(1) амортизированно на шаг).
+    """
+    first_full = period - 1
+    if len(values) - first_full <= _DIRECT_SCAN_WINDOWS:
+        return [max(values[i - period + 1:i + 1]) for i in range(first_full, len(values))]
+
+    window: Deque[int] = deque()
+    result: List[float] = []
+    for i in range(len(values)):
+        value = values[i]
+        if window and window[0] <= i - period:
+            window.popleft()
+        while window and values[window[-1]] <= value:
+            window.pop()
+        window.append(i)
+        if i >= first_full:
+            result.append(values[window[0]])
+    return result
+
+def _sliding_min(values: List[float], period: int) -> List[float]:
+    """
+    Минимумы всех окон длины period в values; зеркально _sliding_max.
+    """
+    first_full = period - 1
+    if len(values) - first_full <= _DIRECT_SCAN_WINDOWS:
+        return [min(values[i - period + 1:i + 1]) for i in range(first_full, len(values))]
+
+    window: Deque[int] = deque()
+    result: List[float] = []
+    for i in range(len(values)):
+        value = values[i]
+        if window and window[0] <= i - period:
+            window.popleft()
+        while window and values[window[-1]] >= value:
+            window.pop()
+        window.append(i)
+        if i >= first_full:
+            result.append(values[window[0]])
+    return result
+
+def _stoch_core(
+    highs: List[float],
+    lows: List[float],
+    closes: List[float],
+    k_period: int,
+    d_period: int,
+    start: int = 0
+) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Ядро расчёта стохастика по рядам high/low/close одинаковой длины,
+    начиная с индекса start (столбцы читаются на месте, без копий).
+
+    Экстремумы окна, %K и накопление для %D считаются в одном цикле:
+    промежуточные ряды экстремумов и %K не строятся, для %D хранятся только
+    последние d_period значений %K.
+
+    Возвращает последние %K и %D или (None, None), если данных не хватает.
+    """
+    n = len(closes)
+    first_full = start + k_period - 1
+    windows = n - first_full
+    if windows < d_period:
+        return None, None
+
+    pk_ring: Deque[float] = deque(maxlen=d_period)
+
+    if windows <= _DIRECT_SCAN_WINDOWS:
+        for i in range(first_full, n):
+            window_start = i - k_period + 1
+            lowest_low = min(lows[window_start:i + 1])
+            highest_high = max(highs[window_start:i + 1])
+            # Закрытие лежит между минимумом и максимумом окна, поэтому при нулевом
+            # диапазоне числитель тоже 0 и деление на (диапазон or 1.0) даёт %K = 0 без ветвления
+            pk_ring.append(((closes[i] - lowest_low) / ((highest_high - lowest_low) or 1.0)) * 100)
+    else:
+        # Монотонные очереди индексов, как в _sliding_max/_sliding_min
+        dq_hi: Deque[int] = deque()
+        dq_lo: Deque[int] = deque()
+        for i in range(start, n):
+            if dq_hi and dq_hi[0] <= i - k_period:
+                dq_hi.popleft()
+            high = highs[i]
+            while dq_hi and highs[dq_hi[-1]] <= high:
+                dq_hi.pop()
+            dq_hi.append(i)
+
+            if dq_lo and dq_lo[0] <= i - k_period:
+                dq_lo.popleft()
+            low = lows[i]
+            while dq_lo and lows[dq_lo[-1]] >= low:
+                dq_lo.pop()
+            dq_lo.append(i)
+
+            if i >= first_full:
+                lowest_low = lows[dq_lo[0]]
+                highest_high = highs[dq_hi[0]]
+                pk_ring.append(((closes[i] - lowest_low) / ((highest_high - lowest_low) or 1.0)) * 100)
+
+    return pk_ring[-1], sum(pk_ring) / d_period
 
 def calculate_stochastic_oscillator(
-    candles: List[Dict[str, float]], 
+    candles: Candles, 
     k_period: int = 14, 
     d_period: int = 3
 ) -> Tuple[Optional[float], Optional[float]]:
@@ -13,39 +132,146 @@ def calculate_stochastic_oscillator(
     if len(candles) < needed:
         return None, None
 
-    relevant_candles = candles[-needed:]
-    highs = [float(candle['high']) for candle in relevant_candles]
-    lows = [float(candle['low']) for candle in relevant_candles]
-    closes = [float(candle['close']) for candle in relevant_candles]
+    # Столбцы Candles уже float-списки: окно задаётся смещением, без копирования
+    return _stoch_core(
+        candles.high, candles.low, candles.close, k_period, d_period, start=len(candles) - needed
+    )
 
-    percent_k_list = []
-    for i in range(k_period - 1, len(closes)):
-        highest_high = max(highs[i - k_period + 1:i + 1])
-        lowest_low = min(lows[i - k_period + 1:i + 1])
-        current_close = closes[i]
+def calculate_stochastic_series(
+    highs: List[float],
+    lows: List[float],
+    closes: List[float],
+    k_period: int = 14,
+    d_period: int = 3
+) -> Tuple[List[float], List[float]]:
+    """
+    Рассчитывает полные ряды %K и %D (например, для бэктеста) за один проход.
 
-        if highest_high == lowest_low:
-            percent_k = 0
-        else:
-            percent_k = ((current_close - lowest_low) / (highest_high - lowest_low)) * 100
+    percent_k[j] относится к свече k_period - 1 + j, percent_d[j] — к свече
+    k_period + d_period - 2 + j. Если данных не хватает, ряды пустые.
+    """
+    highest_highs = _sliding_max(highs, k_period)
+    lowest_lows = _sliding_min(lows, k_period)
+    percent_k = [
+        ((close - lowest_low) / ((highest_high - lowest_low) or 1.0)) * 100
+        for close, highest_high, lowest_low in zip(
+            islice(closes, k_period - 1, None), highest_highs, lowest_lows
+        )
+    ]
 
-        percent_k_list.append(percent_k)
+    percent_d: List[float] = []
+    if len(percent_k) >= d_period:
+        inv_d = 1.0 / d_period
+        running = sum(percent_k[:d_period])
+        percent_d.append(running * inv_d)
+        for i in range(d_period, len(percent_k)):
+            running += percent_k[i] - percent_k[i - d_period]
+            percent_d.append(running * inv_d)
 
-    if len(percent_k_list) < d_period:
-        return None, None
+    return percent_k, percent_d
+
+class StochasticState:
+    """
+    Инкрементальный стохастик для потока свечей.
+
+    Хранит монотонные очереди экстремумов текущего окна и последние d_period
+    значений %K, поэтому каждая новая закрытая свеча обрабатывается за O(1)
+    амортизированно, без пересчёта всего окна.
+    """
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        self.k_period = k_period
+        self.d_period = d_period
+        self._tick = 0
+        self._dq_hi: Deque[Tuple[int, float]] = deque()
+        self._dq_lo: Deque[Tuple[int, float]] = deque()
+        self._pk_ring: Deque[float] = deque(maxlen=d_period)
+        self._inv_d = 1.0 / d_period
+        # Скользящая сумма %K в кольце; периодически пересчитывается через fsum,
+        # чтобы ошибка округления не накапливалась на долгом потоке
+        self._running = 0.0
+        self._since_resync = 0
+
+    def push(self, high: float, low: float, close: float) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Добавляет закрытую свечу и возвращает (%K, %D).
+
+        Пока свечей меньше k_period, возвращает (None, None); пока значений %K
+        меньше d_period — (%K, None).
+        """
+        tick = self._tick
+        self._tick += 1
+        window_start = tick - self.k_period + 1
+
+        dq_hi = self._dq_hi
+        if dq_hi and dq_hi[0][0] < window_start:
+            dq_hi.popleft()
+        while dq_hi and dq_hi[-1][1] <= high:
+            dq_hi.pop()
+        dq_hi.append((tick, high))
+
+        dq_lo = self._dq_lo
+        if dq_lo and dq_lo[0][0] < window_start:
+            dq_lo.popleft()
+        while dq_lo and dq_lo[-1][1] >= low:
+            dq_lo.pop()
+        dq_lo.append((tick, low))
 
-    percent_d_list = []
-    for i in range(d_period - 1, len(percent_k_list)):
-        percent_d = sum(percent_k_list[i - d_period + 1:i + 1]) / d_period
-        percent_d_list.append(percent_d)
+        if window_start < 0:
+            return None, None
 
-    last_percent_k = percent_k_list[-1]
-    last_percent_d = percent_d_list[-1]
+        highest_high = dq_hi[0][1]
+        lowest_low = dq_lo[0][1]
+        percent_k = ((close - lowest_low) / ((highest_high - lowest_low) or 1.0)) * 100
 
-    return last_percent_k, last_percent_d
+        pk_ring = self._pk_ring
+        if len(pk_ring) == self.d_period:
+            self._running -= pk_ring[0]
+        pk_ring.append(percent_k)
+        self._running += percent_k
+
+        self._since_resync += 1
+        if self._since_resync >= _RESYNC_INTERVAL:
+            self._running = math.fsum(pk_ring)
+            self._since_resync = 0
+
+        if len(pk_ring) < self.d_period:
+            return percent_k, None
+        return percent_k, self._running * self._inv_d
+
+def _stochastic_signal(
+    percent_k: float,
+    percent_d: float,
+    oversold: float,
+    overbought: float
+) -> Optional[str]:
+    """
+    Сигнал стохастика по уже рассчитанным %K и %D.
+    """
+    if percent_k < oversold and percent_d < oversold:
+        return 'stochastic_long'
+    if percent_k > overbought and percent_d > overbought:
+        return 'stochastic_short'
+    return None
+
+def analyze_stochastic_signal(
+    candles: Candles,
+    k_period: int = 14,
+    d_period: int = 3,
+    oversold: float = 20,
+    overbought: float = 80
+) -> Optional[str]:
+    """
+    Возвращает только сигнал стохастика ('stochastic_long', 'stochastic_short' или None)
+    без построения словаря результата — для циклов, которым не нужны %K и %D.
+    """
+    if len(candles) < k_period + d_period - 1:
+        return None
+    percent_k, percent_d = calculate_stochastic_oscillator(candles, k_period, d_period)
+    return _stochastic_signal(percent_k, percent_d, oversold, overbought)
 
 def analyze_stochastic(
-    candles: List[Dict[str, float]], 
+    candles: Candles, 
     k_period: int = 14, 
     d_period: int = 3, 
     oversold: float = 20, 
@@ -54,21 +280,17 @@ def analyze_stochastic(
     """
     Анализирует стохастический осциллятор для заданных свечей.
     
-    Оптимизирует количество свечей для расчёта, используя только необходимые (k_period + d_period - 1).
+    Для расчёта используются только необходимые (k_period + d_period - 1) свечи;
+    обрезку выполняет calculate_stochastic_oscillator.
     Рассчитывает %K и %D и генерирует сигнал:
       - 'stochastic_long', если оба значения ниже уровня перепроданности (oversold),
       - 'stochastic_short', если оба значения выше уровня перекупленности (overbought),
       - None, если условия не выполнены.
     """
-    needed = k_period + d_period - 1
-    if len(candles) > needed:
-        candles = candles[-needed:]
-        
+    # Короткое окно отсекается до любого расчёта
+    if len(candles) < k_period + d_period - 1:
+        return {'%K': None, '%D': None, 'signal': None}
+
     percent_k, percent_d = calculate_stochastic_oscillator(candles, k_period, d_period)
-    signal = None
-    if percent_k is not None and percent_d is not None:
-        if percent_k < oversold and percent_d < oversold:
-            signal = 'stochastic_long'
-        elif percent_k > overbought and percent_d > overbought:
-            signal = 'stochastic_short'
+    signal = _stochastic_signal(percent_k, percent_d, oversold, overbought)
     return {'%K': percent_k, '%D': percent_d, 'signal': signal}